@@ -1,4 +1,3 @@
-import math
 from typing import Callable, List
 
 import numpy as np
@@ -21,7 +20,7 @@ def get_masks() -> List[Callable]:
         lambda i, j: i % 2 == 0,
         lambda i, j: j % 3 == 0,
         lambda i, j: (i + j) % 3 == 0,
-        lambda i, j: (math.floor(i / 2) + math.floor(j / 3)) % 2 == 0,
+        lambda i, j: (i // 2 + j // 3) % 2 == 0,
         lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
         lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
         lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
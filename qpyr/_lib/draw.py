@@ -1,6 +1,6 @@
-from typing import Optional
+import numpy as np
 from numpy.typing import NDArray
-from PIL import Image, ImageDraw
+from PIL import Image, ImageColor, ImageDraw
 
 from qpyr._lib.static import ColorValue
 
@@ -18,11 +18,6 @@ def draw(grid: NDArray, cell_size: int = 20, outline=None) -> Image.Image:
     if grid.shape[0] != grid.shape[1]:
         raise ValueError("The input grid must be square (n x n).")
 
-    # Initialize an image object with white background
-    img_size = grid.shape[0] * cell_size
-    img = Image.new("RGB", (img_size, img_size), "lightgray")
-    draw = ImageDraw.Draw(img)
-
     color_map = {
         ColorValue.WHITE: "white",
         ColorValue.BLACK: "black",
@@ -30,11 +25,20 @@ def draw(grid: NDArray, cell_size: int = 20, outline=None) -> Image.Image:
         ColorValue.DUMMY_VALUE: "red",
     }
 
-    for i in range(grid.shape[0]):  # Rows
-        for j in range(grid.shape[1]):  # Columns
-            x0, y0 = j * cell_size, i * cell_size  # Corrected here
-            x1, y1 = x0 + cell_size, y0 + cell_size
-            cell_value = grid[i, j]
-            cell_color = color_map.get(cell_value, "white")
-            draw.rectangle(((x0, y0), (x1, y1)), fill=cell_color, outline=outline)
+    # Map every cell to an index into the palette, unknown values fall back to white (index 0)
+    palette = np.array([ImageColor.getrgb(color)[:3] for color in color_map.values()], dtype=np.uint8)
+    palette_index = np.zeros(grid.shape, dtype=np.uint8)
+    for index, value in enumerate(color_map):
+        palette_index[grid == value] = index
+
+    # Draw one pixel per cell and scale every cell up to cell_size x cell_size pixels
+    img_size = grid.shape[0] * cell_size
+    img = Image.fromarray(palette[palette_index], "RGB").resize((img_size, img_size), Image.NEAREST)
+
+    if outline is not None:
+        draw = ImageDraw.Draw(img)
+        for offset in range(0, img_size, cell_size):
+            draw.line(((offset, 0), (offset, img_size - 1)), fill=outline)
+            draw.line(((0, offset), (img_size - 1, offset)), fill=outline)
+
     return img
@@ -1,86 +1,149 @@
-from typing import List
+import functools
+from typing import List, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
 
 from qpyr._lib.static import ECC_CODEWORDS_PER_BLOCK, NUM_ERROR_CORRECTION_BLOCKS
 from qpyr._lib.utils import get_num_raw_data_modules
 
 
+def _build_gf_tables() -> Tuple[List[int], List[int]]:
+    """Returns the exponent and logarithm tables of GF(2^8/0x11D) for the generator element 0x02.
+    The exponent table is doubled in length so that the sum of two logarithms can index it directly."""
+    exp: List[int] = [0] * 512
+    log: List[int] = [0] * 256
+    x: int = 1
+    for i in range(255):
+        exp[i] = exp[i + 255] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x11D
+    return exp, log
+
+
+def _gf_multiply_branchless(x, y):
+    """Returns the product of the two given field elements modulo GF(2^8/0x11D) without tables or branches.
+    Works elementwise on signed NumPy integer arrays as well as on ints: the carry-less product is folded
+    by the field polynomial, and every conditional step is replaced by an arithmetic bit mask."""
+    z = 0
+    for i in range(8):
+        z = z ^ (-((y >> i) & 1) & (x << i))
+    for i in range(14, 7, -1):  # The carry-less product of two bytes has at most 15 bits
+        z = z ^ (-((z >> i) & 1) & (0x11D << (i - 8)))
+    return z
+
+
+_GF_EXP, _GF_LOG = _build_gf_tables()
+
+
+@functools.lru_cache(maxsize=256)
 def _reed_solomon_compute_divisor(degree: int) -> bytes:
-    """Returns a Reed-Solomon ECC generator polynomial for the given degree. This could be
-    implemented as a lookup table over all possible parameter values, instead of as an algorithm."""
+    """Returns a Reed-Solomon ECC generator polynomial for the given degree. The result only depends on
+    the degree, so it is cached and returned as immutable bytes."""
     if not (1 <= degree <= 255):
         raise ValueError("Degree out of range")
     # Polynomial coefficients are stored from highest to lowest power, excluding the leading term which is always 1.
     # For example the polynomial x^3 + 255x^2 + 8x + 93 is stored as the uint8 array [255, 8, 93].
-    result = bytearray([0] * (degree - 1) + [1])  # Start off with the monomial x^0
+    result: NDArray = np.zeros(degree, dtype=np.uint8)
+    result[-1] = 1  # Start off with the monomial x^0
 
     # Compute the product polynomial (x - r^0) * (x - r^1) * (x - r^2) * ... * (x - r^{degree-1}),
     # and drop the highest monomial term which is always 1x^degree.
     # Note that r = 0x02, which is a generator element of this field GF(2^8/0x11D).
     root: int = 1
     for _ in range(degree):  # Unused variable i
-        # Multiply the current product by (x - r^i)
-        for j in range(degree):
-            result[j] = _reed_solomon_multiply(result[j], root)
-            if j + 1 < degree:
-                result[j] ^= result[j + 1]
+        # Multiply the current product by (x - r^i), every coefficient picks up the next unmultiplied one
+        product: NDArray = _gf_multiply_branchless(root, result.astype(np.int32)).astype(np.uint8)
+        product[:-1] ^= result[1:]
+        result = product
         root = _reed_solomon_multiply(root, 0x02)
+    return result.tobytes()
+
+
+@functools.lru_cache(maxsize=256)
+def _reed_solomon_divisor_multiples(divisor: bytes) -> NDArray:
+    """Returns the 256*len(divisor) array whose row f holds the product of every divisor coefficient with
+    the factor f. It is computed with the branchless multiply and cached per divisor, so no 64 KB table of
+    all field products is needed."""
+    factors: NDArray = np.arange(256, dtype=np.int32)[:, np.newaxis]
+    coefficients: NDArray = np.frombuffer(divisor, dtype=np.uint8).astype(np.int32)[np.newaxis, :]
+    result: NDArray = _gf_multiply_branchless(factors, coefficients).astype(np.uint8)
+    result.flags.writeable = False
     return result
 
 
 def _reed_solomon_compute_remainder(data: bytes, divisor: bytes) -> bytes:
     """Returns the Reed-Solomon error correction codeword for the given data and divisor polynomials."""
-    result = bytearray([0] * len(divisor))
-    for b in data:  # Polynomial division
-        factor: int = b ^ result.pop(0)
-        result.append(0)
-        for i, coef in enumerate(divisor):
-            result[i] ^= _reed_solomon_multiply(coef, factor)
+    blocks: NDArray = np.frombuffer(bytes(data), dtype=np.uint8)[np.newaxis, :]
+    return bytearray(_reed_solomon_compute_remainders(blocks, divisor)[0].tobytes())
+
+
+def _reed_solomon_compute_remainders(blocks: NDArray, divisor: bytes) -> NDArray:
+    """Returns the Reed-Solomon error correction codewords for every row of the given 2D uint8 array of
+    data blocks. All blocks are divided in lockstep, so shorter blocks must be padded with leading zero
+    bytes, which leave their remainder unchanged."""
+    # Row f holds the product of every divisor coefficient with the factor f
+    products: NDArray = _reed_solomon_divisor_multiples(bytes(divisor))
+    result: NDArray = np.zeros((blocks.shape[0], len(divisor)), dtype=np.uint8)
+    for column in blocks.T:  # Polynomial division
+        factors: NDArray = column ^ result[:, 0]
+        result[:, :-1] = result[:, 1:]
+        result[:, -1] = 0
+        result ^= products[factors]
     return result
 
 
 def _reed_solomon_multiply(x: int, y: int) -> int:
     """Returns the product of the two given field elements modulo GF(2^8/0x11D). The arguments and result
-    are unsigned 8-bit integers. This could be implemented as a lookup table of 256*256 entries of uint8."""
+    are unsigned 8-bit integers. Uses the precomputed exponent and logarithm tables of the field."""
     if (x >> 8 != 0) or (y >> 8 != 0):
         raise ValueError("Byte out of range")
-    # Russian peasant multiplication
-    z: int = 0
-    for i in reversed(range(8)):
-        z = (z << 1) ^ ((z >> 7) * 0x11D)
-        z ^= ((y >> i) & 1) * x
-    assert z >> 8 == 0
-    return z
+    if x == 0 or y == 0:
+        return 0
+    return _GF_EXP[_GF_LOG[x] + _GF_LOG[y]]
 
 
-def add_ecc_and_interleave(version: int, ecl: str, data: bytearray) -> bytearray:
-    """Returns a new byte string representing the given data with the appropriate error correction
-    codewords appended to it, based on this object's version and error correction level."""
-    # Calculate parameter numbers
+@functools.lru_cache(maxsize=None)
+def _get_ecc_parameters(version: int, ecl: str) -> Tuple[int, int, int, int, int, bytes]:
+    """Returns the block layout and the Reed-Solomon divisor for the given version and error correction
+    level, as (numblocks, blockecclen, rawcodewords, numshortblocks, shortblocklen, rsdiv)."""
     numblocks: int = NUM_ERROR_CORRECTION_BLOCKS[ecl][version]
     blockecclen: int = ECC_CODEWORDS_PER_BLOCK[ecl][version]
     rawcodewords: int = get_num_raw_data_modules(version) // 8
     numshortblocks: int = numblocks - rawcodewords % numblocks
     shortblocklen: int = rawcodewords // numblocks
-
-    # Split data into blocks and append ECC to each block
-    blocks: List[bytes] = []
     rsdiv: bytes = _reed_solomon_compute_divisor(blockecclen)
-    k: int = 0
-    for i in range(numblocks):
-        dat: bytearray = data[k : k + shortblocklen - blockecclen + (0 if i < numshortblocks else 1)]
-        k += len(dat)
-        ecc: bytes = _reed_solomon_compute_remainder(dat, rsdiv)
-        if i < numshortblocks:
-            dat.append(0)
-        blocks.append(dat + ecc)
-    assert k == len(data)
+    return numblocks, blockecclen, rawcodewords, numshortblocks, shortblocklen, rsdiv
+
+
+def add_ecc_and_interleave(version: int, ecl: str, data: bytearray) -> bytearray:
+    """Returns a new byte string representing the given data with the appropriate error correction
+    codewords appended to it, based on this object's version and error correction level."""
+    numblocks, blockecclen, rawcodewords, numshortblocks, shortblocklen, rsdiv = _get_ecc_parameters(version, ecl)
+
+    # Split data into blocks, short blocks are padded with a leading zero byte to compute all ECC at once
+    datalen: int = shortblocklen - blockecclen + 1
+    split: int = numshortblocks * (datalen - 1)
+    assert split + (numblocks - numshortblocks) * datalen == len(data)
+    data_bytes: NDArray = np.frombuffer(bytes(data), dtype=np.uint8)
+    datablocks: NDArray = np.zeros((numblocks, datalen), dtype=np.uint8)
+    datablocks[:numshortblocks, 1:] = data_bytes[:split].reshape(numshortblocks, datalen - 1)
+    datablocks[numshortblocks:] = data_bytes[split:].reshape(numblocks - numshortblocks, datalen)
+
+    eccblocks: NDArray = _reed_solomon_compute_remainders(datablocks, rsdiv)
+
+    # Append ECC to each block, short blocks get a padding byte after their data to make all blocks equal length
+    blocks: NDArray = np.zeros((numblocks, shortblocklen + 1), dtype=np.uint8)
+    blocks[:numshortblocks, : datalen - 1] = datablocks[:numshortblocks, 1:]
+    blocks[numshortblocks:, :datalen] = datablocks[numshortblocks:]
+    blocks[:, datalen:] = eccblocks
 
     # Interleave (not concatenate) the bytes from every block into a single sequence
-    result = bytearray()
-    for i in range(len(blocks[0])):
-        for j, blk in enumerate(blocks):
-            # Skip the padding byte in short blocks
-            if (i != shortblocklen - blockecclen) or (j >= numshortblocks):
-                result.append(blk[i])
+    # by reading the blocks column by column, skipping the padding byte in short blocks
+    keep: NDArray = np.ones(blocks.shape, dtype=bool)
+    keep[:numshortblocks, datalen - 1] = False
+    result = bytearray(blocks.T[keep.T].tobytes())
     assert len(result) == rawcodewords
     return result
@@ -1,4 +1,5 @@
-from typing import Callable, Dict, List, Optional, Tuple
+import functools
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 import numpy as np
 from numpy.typing import NDArray
@@ -12,114 +13,102 @@ from qpyr._lib.data_masking import (
     get_same_color_block_penalty,
 )
 from qpyr._lib.static import ColorValue
-from qpyr._lib.utils import get_grid_size
+from qpyr._lib.utils import bits_to_array, get_grid_size
 
 
-CoordinateValueMap = Dict[Tuple[int, int], int]
+class Pattern(NamedTuple):
+    """Cells to set on the grid, as parallel arrays of row indices, column indices and values."""
 
+    rows: NDArray
+    cols: NDArray
+    values: NDArray
 
-def get_timing_pattern(grid_size: int = 21) -> CoordinateValueMap:
-    fixed_row, fixed_col = 6, 6
-    timing_pattern_row_black = {(fixed_row, x): ColorValue.BLACK for x in range(0, grid_size, 2)}
-    timing_pattern_row_white = {(fixed_row, x): ColorValue.WHITE for x in range(1, grid_size, 2)}
-    timing_pattern_col_black = {(x, fixed_col): ColorValue.BLACK for x in range(0, grid_size, 2)}
-    timing_pattern_col_white = {(x, fixed_col): ColorValue.WHITE for x in range(1, grid_size, 2)}
-    result: CoordinateValueMap = {
-        **timing_pattern_row_black,
-        **timing_pattern_row_white,
-        **timing_pattern_col_black,
-        **timing_pattern_col_white,
-    }
-    return result
 
+def _empty_pattern() -> Pattern:
+    return Pattern(np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int8))
 
-def _finder_and_seperator_pattern_generator(row, col, grid_size) -> CoordinateValueMap:
-    result = {}
-    for r in range(-1, 8):
-        if row + r <= -1 or grid_size <= row + r:
-            continue
 
-        for c in range(-1, 8):
-            if col + c <= -1 or grid_size <= col + c:
-                continue
-
-            if (0 <= r <= 6 and c in (0, 6)) or (0 <= c <= 6 and r in (0, 6)) or (2 <= r <= 4 and 2 <= c <= 4):
-                result[(row + r, col + c)] = ColorValue.BLACK
-            else:
-                result[(row + r, col + c)] = ColorValue.WHITE
-    return result
+def combine_patterns(*patterns: Pattern) -> Pattern:
+    """Returns one pattern holding the cells of all given patterns, so they can be applied in a single pass.
+    The patterns must not overlap, as NumPy does not define which value wins for repeated indices."""
+    return Pattern(*(np.concatenate(arrays) for arrays in zip(*patterns)))
 
 
-def get_finder_and_seperator(grid_size) -> CoordinateValueMap:
-    top_left = _finder_and_seperator_pattern_generator(0, 0, grid_size)
-    bottom_left = _finder_and_seperator_pattern_generator(grid_size - 7, 0, grid_size)
-    top_right = _finder_and_seperator_pattern_generator(0, grid_size - 7, grid_size)
-    return {**top_left, **bottom_left, **top_right}
+# A 7x7 finder pattern surrounded by its one module wide white seperator
+_FINDER_AND_SEPERATOR_PATTERN: NDArray = np.zeros((9, 9), dtype=np.int8)
+_FINDER_AND_SEPERATOR_PATTERN[1:8, 1:8] = ColorValue.BLACK
+_FINDER_AND_SEPERATOR_PATTERN[2:7, 2:7] = ColorValue.WHITE
+_FINDER_AND_SEPERATOR_PATTERN[3:6, 3:6] = ColorValue.BLACK
 
 
-def add_quiet_zone(grid, border: int = 4):
-    horizontal_zone = np.zeros((grid.shape[0], border), dtype=int)
-    grid = np.hstack((grid, horizontal_zone))
-    grid = np.hstack((horizontal_zone, grid))
+def place_timing_pattern(grid: NDArray) -> NDArray:
+    fixed_row, fixed_col = 6, 6
+    grid[fixed_row, 0::2] = ColorValue.BLACK
+    grid[fixed_row, 1::2] = ColorValue.WHITE
+    grid[0::2, fixed_col] = ColorValue.BLACK
+    grid[1::2, fixed_col] = ColorValue.WHITE
+    return grid
 
-    vertical_zone = np.zeros((border, grid.shape[1]), dtype=int)
-    grid = np.vstack((grid, vertical_zone))
-    grid = np.vstack((vertical_zone, grid))
 
-    assert grid.dtype.name == "int64"
+def _place_finder_and_seperator_pattern(grid: NDArray, row: int, col: int) -> NDArray:
+    """Places a finder pattern with its top left corner at (row, col) together with its seperator,
+    clipping the parts of the seperator that fall outside of the grid."""
+    grid_size = grid.shape[0]
+    top, left = row - 1, col - 1
+    row_start, row_end = max(top, 0), min(top + 9, grid_size)
+    col_start, col_end = max(left, 0), min(left + 9, grid_size)
+    grid[row_start:row_end, col_start:col_end] = _FINDER_AND_SEPERATOR_PATTERN[
+        row_start - top : row_end - top, col_start - left : col_end - left
+    ]
     return grid
 
 
-def override_grid(grid: NDArray, indexes: Dict[tuple, int]) -> NDArray:
-    for index, value in indexes.items():
-        i, j = index
-        grid[i][j] = value
+def place_finder_and_seperator(grid: NDArray) -> NDArray:
+    grid_size = grid.shape[0]
+    for row, col in ((0, 0), (grid_size - 7, 0), (0, grid_size - 7)):
+        grid = _place_finder_and_seperator_pattern(grid, row, col)
     return grid
 
 
-def _iterate_over_grid(grid_size) -> List[Tuple[int, int]]:
-    """Iterates over all grid cells in zig-zag pattern and returns an iterator of tuples (row, col)
-    in order, starting from bottom right."""
-    result = []
-    up = True
-    for column in range(grid_size - 1, 0, -2):
-        if column <= 6:  # skip column 6 because of timing pattern
-            column -= 1
-
-        if up:
-            row = grid_size - 1
-        else:
-            row = 0
-
-        for _ in range(grid_size):
-            for col in (column, column - 1):
-                result.append((row, col))
-            if up:
-                row -= 1
-            else:
-                row += 1
-        if up:
-            up = False
-        else:
-            up = True
+def add_quiet_zone(grid: NDArray, border: int = 4) -> NDArray:
+    rows, cols = grid.shape
+    result = np.zeros((rows + 2 * border, cols + 2 * border), dtype=grid.dtype)
+    result[border : border + rows, border : border + cols] = grid
     return result
 
 
-def get_codeword_placement(binary_str, grid, grid_size) -> CoordinateValueMap:
-    result = {}
-    grid_iterator = _iterate_over_grid(grid_size)
-    for row, col in grid_iterator:
-        if not binary_str:
-            # Pad with white blocks.
-            if grid[row][col] == -1:
-                result[(row, col)] = ColorValue.WHITE
-        elif grid[row][col] == -1:
-            result[(row, col)] = binary_str[0]
-            binary_str = binary_str[1:]
-        else:
-            continue
+def override_grid(grid: NDArray, pattern: Pattern) -> NDArray:
+    grid[pattern.rows, pattern.cols] = pattern.values
+    return grid
 
-    return result
+
+@functools.lru_cache(maxsize=40)
+def _iterate_over_grid(grid_size) -> Tuple[NDArray, NDArray]:
+    """Returns the (rows, cols) index arrays of all grid cells in zig-zag order, starting from bottom right.
+    The order only depends on the grid size, so the arrays are cached and must not be modified."""
+    columns = np.arange(grid_size - 1, 0, -2, dtype=np.int16)
+    columns[columns <= 6] -= 1  # skip column 6 because of timing pattern
+
+    # Every pair of columns alternates between going up and going down
+    up = (np.arange(columns.size) % 2 == 0)[:, np.newaxis]
+    row_order = np.where(up, np.arange(grid_size - 1, -1, -1, dtype=np.int16), np.arange(grid_size, dtype=np.int16))
+
+    rows = np.repeat(row_order, 2, axis=1).ravel()
+    cols = np.tile(np.stack((columns, columns - 1), axis=1), (1, grid_size)).ravel()
+    rows.flags.writeable = cols.flags.writeable = False
+    return rows, cols
+
+
+def get_codeword_placement(bits: NDArray, grid, grid_size) -> Pattern:
+    rows, cols = _iterate_over_grid(grid_size)
+    free = np.flatnonzero(grid[rows, cols] == ColorValue.DEFAULT_VALUE)
+    rows, cols = rows[free], cols[free]
+
+    # Fill the free cells with the data bits and pad the remaining ones with white blocks
+    values = np.full(free.size, ColorValue.WHITE, dtype=np.int8)
+    values[: bits.size] = bits[: free.size]
+
+    return Pattern(rows, cols, values)
 
 
 def get_format_information(ecl: str, mask_reference: int) -> int:
@@ -137,40 +126,34 @@ def get_format_information(ecl: str, mask_reference: int) -> int:
     return bits
 
 
-def get_format_placement(grid_size, format_info: int = ColorValue.DUMMY_VALUE) -> CoordinateValueMap:
-    result = {}
+def get_format_placement(grid_size, format_info: int = ColorValue.DUMMY_VALUE) -> Pattern:
     if format_info == ColorValue.DUMMY_VALUE:
-        format_info_to_draw = [ColorValue.DUMMY_VALUE] * 15
+        format_info_to_draw = np.full(15, ColorValue.DUMMY_VALUE, dtype=np.int8)
     else:
-        format_info_to_draw = [int(x) for x in bin(format_info)[2:].zfill(15)]
-        assert len(format_info_to_draw) == 15
-
-    index = 14
-    for row in range(grid_size):
-        if (row <= 8) or (row >= grid_size - 8):
-            if row in (6, 13):
-                continue
-            result[(row, col := 8)] = format_info_to_draw[index]
-            index -= 1
-
-    index = 0
-    for col in range(grid_size):
-        if (col <= 7) or (col >= grid_size - 8):
-            if col == 6:
-                continue
-            result[(row := 8, col)] = format_info_to_draw[index]
-            index += 1
-
-    result[(grid_size - 8, 8)] = ColorValue.BLACK
-    return result
+        assert format_info >> 15 == 0
+        format_info_to_draw = ((format_info >> np.arange(14, -1, -1)) & 1).astype(np.int8)  # most significant first
 
+    # Column 8 is filled from the top down with the bits in reverse order, row 8 from the left in order
+    col_8_rows = np.r_[0:9, grid_size - 8 : grid_size]
+    col_8_rows = col_8_rows[(col_8_rows != 6) & (col_8_rows != 13)]
+    col_8_values = format_info_to_draw[14 - np.arange(col_8_rows.size)]
 
-def apply_mask(mask: Callable, data: CoordinateValueMap) -> CoordinateValueMap:
-    result = {}
-    for coordinate, value in data.items():
-        i, j = coordinate
-        result[(i, j)] = mask(i, j) ^ int(value)  # int(value) may not be needed if value already int
-    return result
+    row_8_cols = np.r_[0:8, grid_size - 8 : grid_size]
+    row_8_cols = row_8_cols[row_8_cols != 6]
+    row_8_values = format_info_to_draw[: row_8_cols.size]
+
+    # The dark module replaces whatever else would be placed at its position
+    keep = col_8_rows != grid_size - 8
+    col_8_rows, col_8_values = col_8_rows[keep], col_8_values[keep]
+
+    rows = np.concatenate((col_8_rows, np.full(row_8_cols.size, 8), [grid_size - 8]))
+    cols = np.concatenate((np.full(col_8_rows.size, 8), row_8_cols, [8]))
+    values = np.concatenate((col_8_values, row_8_values, np.array([ColorValue.BLACK], dtype=np.int8)))
+    return Pattern(rows, cols, values)
+
+
+def apply_mask(mask: Callable, data: Pattern) -> Pattern:
+    return data._replace(values=mask(data.rows, data.cols) ^ data.values)
 
 
 def _get_alignment_pattern_coords(version, grid_size) -> List[int]:
@@ -198,23 +181,28 @@ def get_alignment_pattern_positions(alignment_pattern_coords: List):
     return positions
 
 
-def get_alignment_patterns(positions) -> CoordinateValueMap:
-    result = {}
-    for position in positions:
-        x, y = position
-        xstart, xend = x - 2, x + 2
-        ystart, yend = y - 2, y + 2
-        for i in range(xstart, xend + 1):
-            for j in range(ystart, yend + 1):
-                if (i == xstart) or (i == xend):
-                    result[i, j] = ColorValue.BLACK
-                elif (j == ystart) or (j == yend):
-                    result[i, j] = ColorValue.BLACK
-                elif (i == x) and (j == y):
-                    result[i, j] = ColorValue.BLACK
-                else:
-                    result[i, j] = ColorValue.WHITE
-    return result
+_ALIGNMENT_PATTERN: NDArray = np.array(
+    [
+        [1, 1, 1, 1, 1],
+        [1, 0, 0, 0, 1],
+        [1, 0, 1, 0, 1],
+        [1, 0, 0, 0, 1],
+        [1, 1, 1, 1, 1],
+    ],
+    dtype=np.int8,
+)
+
+
+def get_alignment_patterns(positions) -> Pattern:
+    if not positions:
+        return _empty_pattern()
+
+    centers = np.array(positions, dtype=np.intp)
+    offset_rows, offset_cols = np.mgrid[-2:3, -2:3]
+    rows = centers[:, 0, np.newaxis] + offset_rows.ravel()
+    cols = centers[:, 1, np.newaxis] + offset_cols.ravel()
+    values = np.tile(_ALIGNMENT_PATTERN.ravel(), len(positions))
+    return Pattern(rows.ravel(), cols.ravel(), values)
 
 
 def get_version_information(version: int) -> Optional[int]:
@@ -232,33 +220,18 @@ def get_version_information(version: int) -> Optional[int]:
     return bits
 
 
-def get_version_placement(version_information: Optional[int], grid_size: int) -> CoordinateValueMap:
+def get_version_placement(version_information: Optional[int], grid_size: int) -> Pattern:
     if not version_information:
-        return {}
-
-    result = {}
-    value = [int(x) for x in bin(version_information)[2:].zfill(18)]
-    value = value[::-1]  # reversed
-
-    value_index = 0
-    top_right_start_index = (0, grid_size - 11)
-    bottom_left_start_index = (grid_size - 11, 0)
-    for row in range(6):
-        for col in range(3):
-            row_index = row
-            col_index = top_right_start_index[1] + col
-            result[(row_index, col_index)] = value[value_index]
-            value_index += 1
-
-    value_index = 0
-    for col in range(6):
-        for row in range(3):
-            col_index = col
-            row_index = bottom_left_start_index[0] + row
-            result[(row_index, col_index)] = value[value_index]
-            value_index += 1
+        return _empty_pattern()
 
-    return result
+    # Bit k (least significant first) goes to the k-th cell of a 6x3 block in the top right,
+    # filled row by row, and of a 3x6 block in the bottom left, filled column by column
+    index = np.arange(18)
+    values = ((version_information >> index) & 1).astype(np.int8)
+    major, minor = np.divmod(index, 3)
+    rows = np.concatenate((major, grid_size - 11 + minor))
+    cols = np.concatenate((grid_size - 11 + minor, major))
+    return Pattern(rows, cols, np.concatenate((values, values)))
 
 
 def matrix(binary_string: str, version: int, ecl: str, quiet_zone_border: int = 4):
@@ -268,34 +241,30 @@ def matrix(binary_string: str, version: int, ecl: str, quiet_zone_border: int =
     version_information_pattern = get_version_placement(version_information, grid_size)
 
     dummy_format_information_placement = get_format_placement(grid_size, format_info=ColorValue.DUMMY_VALUE)
-    finder_and_seperator_pattern = get_finder_and_seperator(grid_size)
-    timing_pattern = get_timing_pattern(grid_size)
 
     alignment_pattern_coords = _get_alignment_pattern_coords(version, grid_size)
     alignment_pattern_positions = get_alignment_pattern_positions(alignment_pattern_coords)
     alignment_pattern = get_alignment_patterns(alignment_pattern_positions)
 
-    grid = np.full((grid_size, grid_size), -1, dtype=int)
+    grid = np.full((grid_size, grid_size), ColorValue.DEFAULT_VALUE, dtype=np.int8)
 
-    grid = override_grid(grid, dummy_format_information_placement)
+    grid = place_timing_pattern(grid)
+    grid = place_finder_and_seperator(grid)
+    function_patterns = combine_patterns(
+        dummy_format_information_placement, version_information_pattern, alignment_pattern
+    )
+    grid = override_grid(grid, function_patterns)
 
-    grid = override_grid(grid, timing_pattern)
-    grid = override_grid(grid, finder_and_seperator_pattern)
-    grid = override_grid(grid, version_information_pattern)
-    grid = override_grid(grid, alignment_pattern)
-
-    codeword_placement = get_codeword_placement(binary_string, grid, grid_size)
+    codeword_placement = get_codeword_placement(bits_to_array(binary_string), grid, grid_size)
     grid = override_grid(grid, codeword_placement)
 
     masks = get_masks()
     best_mask_ref, lowest_penalty_points = (0, 100_000)  # arbitrary large number
     for mask_reference, mask in enumerate(masks):
         masked_codewords = apply_mask(mask, codeword_placement)
-        masked_grid = override_grid(grid, masked_codewords)
-
         format_information = get_format_information(ecl, mask_reference)
         format_information_placement = get_format_placement(grid_size, format_information)
-        masked_grid = override_grid(masked_grid, format_information_placement)
+        masked_grid = override_grid(grid, combine_patterns(masked_codewords, format_information_placement))
 
         adjacent_modules_points = get_adjacent_modules_penalty(masked_grid)
         same_color_block_penalty = get_same_color_block_penalty(masked_grid)
@@ -314,11 +283,9 @@ def matrix(binary_string: str, version: int, ecl: str, quiet_zone_border: int =
 
     best_mask = masks[best_mask_ref]
     masked_codewords = apply_mask(best_mask, codeword_placement)
-    masked_grid = override_grid(grid, masked_codewords)
-
     format_information = get_format_information(ecl, best_mask_ref)
     format_information_placement = get_format_placement(grid_size, format_information)
-    masked_grid = override_grid(masked_grid, format_information_placement)
+    masked_grid = override_grid(grid, combine_patterns(masked_codewords, format_information_placement))
 
     masked_grid = add_quiet_zone(masked_grid, quiet_zone_border)
     return masked_grid
@@ -1,25 +1,34 @@
+from typing import Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
 from qpyr._lib.static import ECC_CODEWORDS_PER_BLOCK, NUM_ERROR_CORRECTION_BLOCKS, TOTAL_NUMBER_OF_CODEWORDS
 
 
+def bits_to_array(bit_string: str) -> NDArray:
+    """Returns the given string of "0" and "1" characters as a uint8 array of 0 and 1 values."""
+    bits = np.frombuffer(bit_string.encode("ascii"), dtype=np.uint8) - ord("0")
+    # Any other character wraps around to a value above 1
+    if bits.size and bits.max() > 1:
+        raise ValueError("Bit string must only contain 0 and 1")
+    return bits
+
+
 def bits_to_bytearray(bit_string):
-    byte_array = bytearray()
+    bits = bits_to_array(bit_string)
 
-    # Split the string into 8-bit chunks and convert to bytes
-    for i in range(0, len(bit_string), 8):
-        byte_chunk = bit_string[i : i + 8]
-        byte = int(byte_chunk, 2)
-        byte_array.append(byte)
+    # A trailing chunk shorter than 8 bits is read as a number, so it is right aligned in its byte
+    remainder = bits.size % 8
+    if remainder:
+        bits = np.concatenate((bits[:-remainder], np.zeros(8 - remainder, dtype=np.uint8), bits[-remainder:]))
 
-    return byte_array
+    return bytearray(np.packbits(bits).tobytes())
 
 
 def bytearray_to_bits(byte_array):
-    bit_string = ""
-    for byte in byte_array:
-        binary_representation = bin(byte)[2:]  # Remove the '0b' prefix
-        padded_binary = binary_representation.zfill(8)  # Pad with zeros to make it 8 bits long
-        bit_string += padded_binary
-    return bit_string
+    bits = np.unpackbits(np.frombuffer(bytes(byte_array), dtype=np.uint8))
+    return (bits + ord("0")).tobytes().decode("ascii")
 
 
 def get_version(grid_size: int):
@@ -47,12 +56,7 @@ def get_total_data_capacity_bytes(ecl: str, version: int) -> int:
     return total_data_codewords
 
 
-def get_num_raw_data_modules(version: int) -> int:
-    """Returns the number of data bits that can be stored in a QR Code of the given version number, after
-    all function modules are excluded. This includes remainder bits, so it might not be a multiple of 8.
-    The result is in the range [208, 29648]. This could be implemented as a 40-entry lookup table."""
-    if not (1 <= version <= 40):
-        raise ValueError("Version number out of range")
+def _compute_num_raw_data_modules(version: int) -> int:
     result: int = (16 * version + 128) * version + 64
     if version >= 2:
         numalign: int = version // 7 + 2
@@ -61,3 +65,16 @@ def get_num_raw_data_modules(version: int) -> int:
             result -= 36
     assert 208 <= result <= 29648
     return result
+
+
+# index 0 is for padding, and is set to an illegal value
+_NUM_RAW_DATA_MODULES: Sequence[int] = (-1,) + tuple(_compute_num_raw_data_modules(v) for v in range(1, 41))
+
+
+def get_num_raw_data_modules(version: int) -> int:
+    """Returns the number of data bits that can be stored in a QR Code of the given version number, after
+    all function modules are excluded. This includes remainder bits, so it might not be a multiple of 8.
+    The result is in the range [208, 29648] and is read from a 40-entry lookup table."""
+    if not (1 <= version <= 40):
+        raise ValueError("Version number out of range")
+    return _NUM_RAW_DATA_MODULES[version]
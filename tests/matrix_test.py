@@ -1,9 +1,19 @@
+import numpy as np
+
 from qpyr._lib.encode import encode
 from qpyr._lib.matrix import (
     _get_alignment_pattern_coords,
+    _iterate_over_grid,
+    add_quiet_zone,
     get_alignment_pattern_positions,
+    get_alignment_patterns,
     get_format_information,
+    get_version_information,
+    get_version_placement,
     matrix,
+    override_grid,
+    place_finder_and_seperator,
+    place_timing_pattern,
 )
 
 
@@ -13,6 +23,49 @@ def test_get_format_information():
     assert result_format_info == expected_format_info
 
 
+def test_place_timing_pattern():
+    grid = place_timing_pattern(np.full((21, 21), -1, dtype=np.int8))
+    assert grid[6].tolist() == [1, 0] * 10 + [1]
+    assert grid[:, 6].tolist() == [1, 0] * 10 + [1]
+    assert (grid[7:, 7:] == -1).all()
+
+
+def test_place_finder_and_seperator():
+    grid = place_finder_and_seperator(np.full((21, 21), -1, dtype=np.int8))
+    finder_and_seperator = [
+        [1, 1, 1, 1, 1, 1, 1, 0],
+        [1, 0, 0, 0, 0, 0, 1, 0],
+        [1, 0, 1, 1, 1, 0, 1, 0],
+        [1, 0, 1, 1, 1, 0, 1, 0],
+        [1, 0, 1, 1, 1, 0, 1, 0],
+        [1, 0, 0, 0, 0, 0, 1, 0],
+        [1, 1, 1, 1, 1, 1, 1, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ]
+    assert grid[:8, :8].tolist() == finder_and_seperator
+    assert grid[13:, :8].tolist() == finder_and_seperator[::-1]
+    assert grid[:8, 13:].tolist() == [row[::-1] for row in finder_and_seperator]
+    assert (grid[8:13, 8:] == -1).all()
+
+
+def test__iterate_over_grid():
+    rows, cols = _iterate_over_grid(21)
+    assert len(rows) == len(cols) == 21 * 20
+    assert list(zip(rows[:4].tolist(), cols[:4].tolist())) == [(20, 20), (20, 19), (19, 20), (19, 19)]
+    assert list(zip(rows[42:44].tolist(), cols[42:44].tolist())) == [(0, 18), (0, 17)]
+    assert 6 not in cols.tolist()
+
+
+def test_add_quiet_zone():
+    grid = np.ones((3, 3), dtype=np.int8)
+    result = add_quiet_zone(grid, border=2)
+    assert result.shape == (7, 7)
+    assert result.dtype == np.int8
+    assert result.sum() == 9
+    assert (result[2:5, 2:5] == 1).all()
+    assert add_quiet_zone(grid, border=0).tolist() == grid.tolist()
+
+
 def test__get_alignment_pattern_coords():
     assert _get_alignment_pattern_coords(version=1, grid_size=21) == []
     assert _get_alignment_pattern_coords(version=2, grid_size=25) == [6, 18]
@@ -37,6 +90,31 @@ def test_get_alignment_pattern_positions():
     assert get_alignment_pattern_positions(coords) == positions
 
 
+def test_get_alignment_patterns():
+    grid = np.full((25, 25), -1, dtype=np.int8)
+    grid = override_grid(grid, get_alignment_patterns([(18, 18)]))
+    assert grid[16:21, 16:21].tolist() == [
+        [1, 1, 1, 1, 1],
+        [1, 0, 0, 0, 1],
+        [1, 0, 1, 0, 1],
+        [1, 0, 0, 0, 1],
+        [1, 1, 1, 1, 1],
+    ]
+    assert (grid == -1).sum() == 25 * 25 - 25
+
+
+def test_get_version_placement():
+    assert get_version_information(7) == 0x07C94
+    assert len(get_version_placement(get_version_information(6), 41).rows) == 0
+
+    grid = np.full((45, 45), -1, dtype=np.int8)
+    grid = override_grid(grid, get_version_placement(get_version_information(7), 45))
+    # 0x07C94 == 0b000111110010010100, least significant bit first
+    top_right = [[0, 0, 1], [0, 1, 0], [0, 1, 0], [0, 1, 1], [1, 1, 1], [0, 0, 0]]
+    assert grid[0:6, 34:37].tolist() == top_right
+    assert grid[34:37, 0:6].T.tolist() == top_right
+
+
 def test_matrix():
     url = "https://en.wikipedia.org/wiki/Circumference#Relationship_with_%CF%80"
     ecl = "H"
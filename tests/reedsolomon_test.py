@@ -1,4 +1,54 @@
-from qpyr._lib.error_correction import add_ecc_and_interleave
+import numpy as np
+
+from qpyr._lib.error_correction import (
+    _gf_multiply_branchless,
+    _reed_solomon_compute_divisor,
+    _reed_solomon_compute_remainder,
+    _reed_solomon_compute_remainders,
+    _reed_solomon_divisor_multiples,
+    _reed_solomon_multiply,
+    add_ecc_and_interleave,
+)
+
+
+def _russian_peasant_multiply(x: int, y: int) -> int:
+    z = 0
+    for i in reversed(range(8)):
+        z = (z << 1) ^ ((z >> 7) * 0x11D)
+        z ^= ((y >> i) & 1) * x
+    return z
+
+
+def test__reed_solomon_multiply():
+    for x in range(256):
+        for y in range(256):
+            expected = _russian_peasant_multiply(x, y)
+            assert _reed_solomon_multiply(x, y) == expected
+            assert _gf_multiply_branchless(x, y) == expected
+
+
+def test__reed_solomon_compute_divisor():
+    # x^7 + a^87 x^6 + a^229 x^5 + a^146 x^4 + a^149 x^3 + a^238 x^2 + a^102 x + a^21
+    assert _reed_solomon_compute_divisor(7) == bytes([127, 122, 154, 164, 11, 68, 117])
+    assert len(_reed_solomon_compute_divisor(30)) == 30
+
+
+def test__reed_solomon_divisor_multiples():
+    divisor = _reed_solomon_compute_divisor(10)
+    multiples = _reed_solomon_divisor_multiples(divisor)
+    assert multiples.shape == (256, 10)
+    for f in range(256):
+        assert multiples[f].tolist() == [_russian_peasant_multiply(f, c) for c in divisor]
+
+
+def test__reed_solomon_compute_remainders():
+    divisor = _reed_solomon_compute_divisor(10)
+    blocks = np.array([[0, 1, 2, 3, 4], [5, 6, 7, 8, 9], [0, 0, 255, 254, 253]], dtype=np.uint8)
+    result = _reed_solomon_compute_remainders(blocks, divisor)
+    assert result.shape == (3, 10)
+    assert result[0].tobytes() == _reed_solomon_compute_remainder(bytes([1, 2, 3, 4]), divisor)
+    assert result[1].tobytes() == _reed_solomon_compute_remainder(bytes([5, 6, 7, 8, 9]), divisor)
+    assert result[2].tobytes() == _reed_solomon_compute_remainder(bytes([255, 254, 253]), divisor)
 
 
 def test__add_ecc_and_interleave():
@@ -8,3 +58,26 @@ def test__add_ecc_and_interleave():
         b"@V\x86V\xc6\xc6\xf0\xec\x11\xec\x11\xec\x11\xec\x11\xec\x16O\xdf\xd4\x8c\x11\xd1\\/\xb7"
     )
     assert data_and_ecc == expected_result
+
+
+def test__add_ecc_and_interleave_mixed_block_lengths():
+    # Version 5-Q has two short blocks of 15 data bytes and two long blocks of 16, each with 18 ECC bytes
+    data = bytearray(range(62))
+    data_and_ecc = add_ecc_and_interleave(version=5, ecl="Q", data=data)
+    expected_result = bytearray.fromhex(
+        "000f1e2e01101f2f02112030031221310413223205142333061524340716253508172636091827370a1928380b1a2939"
+        "0c1b2a3a0d1c2b3b0e1d2c3c2d3d8255124420d802e0398392e7e21c2d7021517bad9c4d105f805e8eeb9eab8344d8d5"
+        "4183d34b61f20df9da834376dc57f14aeb6eaf1cc76e9e240341bca4df1d8ba89584679a8a13"
+    )
+    assert data_and_ecc == expected_result
+
+
+def test__add_ecc_and_interleave_short_block_ecc():
+    # Short blocks are padded with a leading zero byte for the lockstep division, which must not change their ECC
+    data = bytearray(range(62))
+    data_and_ecc = add_ecc_and_interleave(version=5, ecl="Q", data=data)
+    divisor = _reed_solomon_compute_divisor(18)
+    datablocks = [data[0:15], data[15:30], data[30:46], data[46:62]]
+    eccblocks = [data_and_ecc[62 + i :: 4] for i in range(4)]
+    for datablock, eccblock in zip(datablocks, eccblocks):
+        assert eccblock == _reed_solomon_compute_remainder(bytes(datablock), divisor)
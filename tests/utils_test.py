@@ -1,5 +1,41 @@
-from qpyr._lib.utils import get_total_data_capacity_bytes
+import pytest
+
+from qpyr._lib.utils import (
+    bits_to_array,
+    bits_to_bytearray,
+    bytearray_to_bits,
+    get_num_raw_data_modules,
+    get_total_data_capacity_bytes,
+)
+
+
+def test_bits_to_array():
+    assert bits_to_array("0110").tolist() == [0, 1, 1, 0]
+    assert bits_to_array("").tolist() == []
+    for bit_string in ("0120", "01 0", "/"):
+        with pytest.raises(ValueError):
+            bits_to_array(bit_string)
+
+
+def test_bits_to_bytearray():
+    assert bits_to_bytearray("0100000001010110") == bytearray(b"@V")
+    assert bits_to_bytearray("11111111101") == bytearray([255, 5])
+    with pytest.raises(ValueError):
+        bits_to_bytearray("2")
+
+
+def test_bytearray_to_bits():
+    assert bytearray_to_bits(bytearray(b"@V\x00")) == "010000000101011000000000"
 
 
 def test_get_data_codewords_per_block():
     assert get_total_data_capacity_bytes(ecl="H", version=11) == 140
+
+
+def test_get_num_raw_data_modules():
+    assert get_num_raw_data_modules(1) == 208
+    assert get_num_raw_data_modules(7) == 1568
+    assert get_num_raw_data_modules(40) == 29648
+    for version in (0, 41):
+        with pytest.raises(ValueError):
+            get_num_raw_data_modules(version)